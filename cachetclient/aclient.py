@@ -0,0 +1,267 @@
+#   Copyright Red Hat, Inc. All Rights Reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+# asyncio flavor of the client, requires Python 3 and aiohttp:
+#   pip install python-cachetclient[aiohttp]
+#
+# The endpoint classes from cachetclient.cachet are re-used as is: bound to
+# an AsyncCachetClient, their methods return coroutines to be awaited.
+#
+# Failed requests are retried with the same policy as the synchronous client
+# but errors are reported by aiohttp: expect aiohttp.ClientResponseError
+# rather than requests.HTTPError.
+
+import asyncio
+import json
+import ssl
+
+import aiohttp
+
+import cachetclient.cachet as cachet
+from cachetclient.client import (RETRY_BACKOFF, RETRY_METHODS,
+                                 RETRY_STATUSES, _LazyEndpoint,
+                                 _ResponseCache, _loads, orjson)
+
+# Longest wait between two retries, like urllib3's Retry.BACKOFF_MAX
+BACKOFF_MAX = 120
+
+
+def _backoff(retry, retry_after=None):
+    """
+    Seconds to wait before a given retry: nothing before the first one, then
+    an exponential backoff unless the server asked for a longer wait
+    """
+    if retry <= 1:
+        delay = 0
+    else:
+        delay = min(BACKOFF_MAX, RETRY_BACKOFF * 2 ** (retry - 1))
+    if retry_after is not None and retry_after.isdigit():
+        delay = max(delay, int(retry_after))
+    return delay
+
+
+class AsyncCachetClient(object):
+    components = _LazyEndpoint('AsyncComponents', 'cachetclient.aclient')
+    incidents = _LazyEndpoint('AsyncIncidents', 'cachetclient.aclient')
+    points = _LazyEndpoint('AsyncPoints', 'cachetclient.aclient')
+
+    def __init__(self, **kwargs):
+        """
+        Initialize the class, get the necessary parameters
+        """
+        try:
+            self.endpoint = kwargs['endpoint'].rstrip('/')
+        except KeyError:
+            raise KeyError('Cachet API endpoint is required')
+        self._url = self.endpoint + '/'
+
+        self.user_agent = kwargs.get('user_agent', 'python-cachetclient')
+        self.timeout = kwargs.get('timeout', None)
+        self.verify = kwargs.get('verify', None)
+        self.pagination = kwargs.get('pagination', False)
+        self.limit = kwargs.get('limit', 100)
+        self.limit_per_host = kwargs.get('limit_per_host', 30)
+        self.keepalive_timeout = kwargs.get('keepalive_timeout', 60)
+        self.max_retries = kwargs.get('max_retries', 3)
+        self.cache_ttl = kwargs.get('cache_ttl', None)
+        self._cache = _ResponseCache(ttl=self.cache_ttl)
+        self._endpoints = {}
+
+        self.headers = {
+            'User-Agent': self.user_agent,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+
+        # The session is created on first use since aiohttp expects it to be
+        # created from within a running event loop.
+        self._session = None
+        self.api_token = kwargs.get('api_token', None)
+
+    @property
+    def api_token(self):
+        return self._api_token
+
+    @api_token.setter
+    def api_token(self, api_token):
+        # Keep the session headers in sync with the token
+        self._api_token = api_token
+        headers = [self.headers]
+        if self._session is not None:
+            headers.append(self._session.headers)
+        for h in headers:
+            if api_token is None:
+                h.pop('X-Cachet-Token', None)
+            else:
+                h['X-Cachet-Token'] = api_token
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  headers=self.headers)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _request(self, url, method, parse_json=True, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault('timeout',
+                              aiohttp.ClientTimeout(total=self.timeout))
+
+        if self.verify is not None:
+            if self.verify is False:
+                kwargs.setdefault('ssl', False)
+            elif self.verify is not True:
+                # Path to a CA bundle, like requests' verify
+                kwargs.setdefault('ssl', ssl.create_default_context(
+                    cafile=self.verify))
+
+        # If we're sending data, make sure it's json encoded. kwargs is left
+        # untouched in case the request has to be sent again for pagination.
+        request_kwargs = dict(kwargs)
+        if 'data' in request_kwargs:
+            data = request_kwargs.pop('data')
+            if orjson is not None:
+                request_kwargs['data'] = orjson.dumps(data)
+            else:
+                request_kwargs['data'] = json.dumps(data)
+
+        # Only idempotent requests are retried, see RETRY_METHODS
+        retries = self.max_retries if method in RETRY_METHODS else 0
+        retry = 0
+        while True:
+            retry_after = None
+            try:
+                async with self.session.request(method, url,
+                                                **request_kwargs) as resp:
+                    if retry < retries and resp.status in RETRY_STATUSES:
+                        retry_after = resp.headers.get('Retry-After')
+                    else:
+                        resp.raise_for_status()
+                        # Empty responses (i.e, from DELETE) don't need to be
+                        # decoded
+                        content = await resp.read() if parse_json else None
+                        break
+            except aiohttp.ClientConnectionError:
+                if retry >= retries:
+                    raise
+            retry += 1
+            await asyncio.sleep(_backoff(retry, retry_after))
+
+        if content:
+            body = _loads(content)
+        else:
+            body = None
+
+        if not self.pagination:
+            if body is not None and 'meta' in body and \
+               'pagination' in body['meta']:
+                page_info = body['meta']['pagination']
+                if page_info['total'] > page_info['count']:
+                    # There are items not displayed in our result
+                    kwargs.setdefault('params', kwargs.get('params', {}))
+                    kwargs['params']['per_page'] = page_info['total']
+                    return await self._request(url, method, **kwargs)
+
+        return resp, body
+
+    async def _delete(self, path, **kwargs):
+        url = self._url + path
+        try:
+            response, data = await self._request(url, 'DELETE',
+                                                 parse_json=False, **kwargs)
+        finally:
+            self._cache.invalidate(path)
+        return True
+
+    async def _get(self, path, **kwargs):
+        url = self._url + path
+        response, data = await self._request(url, 'GET', **kwargs)
+        return data
+
+    async def _get_cached(self, path, ttl=None):
+        """
+        Same as _get but memoizes the response for a given path.
+        Cached responses expire after ttl (or cache_ttl) seconds, if set, and
+        are dropped when the same path is updated or deleted.
+        """
+        try:
+            return self._cache.lookup(path, ttl)
+        except KeyError:
+            return self._cache.store(path, await self._get(path))
+
+    async def _post(self, path, **kwargs):
+        url = self._url + path
+        response, data = await self._request(url, 'POST', **kwargs)
+        return data
+
+    async def _put(self, path, **kwargs):
+        url = self._url + path
+        try:
+            response, data = await self._request(url, 'PUT', **kwargs)
+        finally:
+            self._cache.invalidate(path)
+        return data
+
+
+class AsyncCachet(object):
+    """
+    Mixin that binds cachetclient.cachet endpoint classes to an
+    AsyncCachetClient.
+    """
+    def __init__(self, client=None, **kwargs):
+        if client is None:
+            client = AsyncCachetClient(**kwargs)
+        self._client = client
+
+
+class AsyncComponents(AsyncCachet, cachet.Components):
+    """
+    /components API endpoint
+    """
+
+
+class AsyncIncidents(AsyncCachet, cachet.Incidents):
+    """
+    /incidents API endpoint
+    """
+
+
+class AsyncPoints(AsyncCachet, cachet.Points):
+    """
+    /metrics/<metric>/points API endpoint
+    """
+    @cachet.api_token_required
+    async def post_bulk(self, id, points):
+        """
+        Posts several points to a metric concurrently, bounded by the
+        client's connection limits.
+        """
+        bulk_args = self._bulk_args(id, points)
+        return await asyncio.gather(*(self.post(**args) for args in bulk_args))
@@ -13,47 +13,64 @@
 #   under the License.
 #
 
-from decorator import decorator
+import functools
 
-import cachetclient.client as client
+import cachetclient.client as cachetclient_client
 import cachetclient.exceptions as exceptions
 
 
-@decorator
-def api_token_required(f, *args, **kwargs):
+def api_token_required(f):
     """
     Decorator helper function to ensure some methods aren't needlessly called
     without an api_token configured.
     """
-    try:
-        if args[0].api_token is None:
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        if self.api_token is None:
             raise AttributeError('Parameter api_token is required.')
-    except AttributeError:
-        raise AttributeError('Parameter api_token is required.')
-
-    return f(*args, **kwargs)
+        return f(self, *args, **kwargs)
+    return wrapper
 
 
 def check_required_args(required_args, args):
     """
     Checks if all required_args have a value.
-    :param required_args: list of required args
+    :param required_args: iterable of required args
     :param args: kwargs
     :return: True (if an exception isn't raised)
     """
-    for arg in required_args:
-        if arg not in args:
-            raise KeyError('Required argument: %s' % arg)
+    missing = frozenset(required_args).difference(args)
+    if missing:
+        raise KeyError('Required arguments: %s' % ', '.join(sorted(missing)))
     return True
 
 
-class Cachet(client.CachetClient):
+class Cachet(object):
     """
-    Base class that extends CachetClient and defaults API methods to
+    Base class that wraps a CachetClient and defaults API methods to
     unimplemented.
+
+    An existing CachetClient can be provided in order to share its HTTP
+    session (and connection pool) across endpoints. Otherwise, a new client
+    is created from the keyword arguments.
     """
-    def __init__(self, **kwargs):
-        super(Cachet, self).__init__(**kwargs)
+    def __init__(self, client=None, **kwargs):
+        if client is None:
+            client = cachetclient_client.CachetClient(**kwargs)
+        self._client = client
+
+    @property
+    def endpoint(self):
+        return self._client.endpoint
+
+    @property
+    def api_token(self):
+        return self._client.api_token
+
+    @api_token.setter
+    def api_token(self, api_token):
+        # Set on the client so that its session headers follow
+        self._client.api_token = api_token
 
     # Default to unimplemented methods
     def delete(self, **kwargs):
@@ -73,43 +90,55 @@ class Ping(Cachet):
     """
     /ping API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Ping, self).__init__(**kwargs)
+    path = 'ping'
 
     def get(self, **kwargs):
         """
         https://docs.cachethq.io/docs/ping
         """
-        return self._get('ping')
+        return self._client._get(self.path)
+
+    def get_cached(self, ttl=None):
+        """
+        Memoized version of get()
+        """
+        return self._client._get_cached(self.path, ttl=ttl)
 
 
 class Version(Cachet):
     """
     /version API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Version, self).__init__(**kwargs)
+    path = 'version'
 
     def get(self, **kwargs):
         """
         https://docs.cachethq.io/docs/version
         """
-        return self._get('version')
+        return self._client._get(self.path)
+
+    def get_cached(self, ttl=None):
+        """
+        Memoized version of get()
+        """
+        return self._client._get_cached(self.path, ttl=ttl)
 
 
 class Components(Cachet):
     """
     /components API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Components, self).__init__(**kwargs)
+    path = 'components'
+    item_path = 'components/%s'
+    post_required_args = frozenset(['name', 'status', 'enabled'])
+    put_required_args = frozenset(['id'])
 
     @api_token_required
     def delete(self, id):
         """
         https://docs.cachethq.io/docs/delete-a-component
         """
-        return self._delete('components/%s' % id)
+        return self._client._delete(self.item_path % id)
 
     def get(self, id=None, **kwargs):
         """
@@ -117,13 +146,20 @@ class Components(Cachet):
         https://docs.cachethq.io/docs/get-a-component
         """
         if id is not None:
-            return self._get('components/%s' % id, data=kwargs)
+            return self._client._get(self.item_path % id, data=kwargs)
         elif 'params' in kwargs:
             data = dict(kwargs)
             params = data.pop('params')
-            return self._get('components', data=data, params=params)
+            return self._client._get(self.path, data=data, params=params)
         else:
-            return self._get('components', data=kwargs)
+            return self._client._get(self.path, data=kwargs)
+
+    def get_cached(self, id, ttl=None):
+        """
+        Memoized version of get() for a single component, dropped from the
+        cache when the component is updated or deleted through this client
+        """
+        return self._client._get_cached(self.item_path % id, ttl=ttl)
 
     @api_token_required
     def post(self, **kwargs):
@@ -133,35 +169,35 @@ class Components(Cachet):
         # default values
         kwargs.setdefault('enabled', kwargs.get('enabled', True))
 
-        required_args = ['name', 'status', 'enabled']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
 
-        return self._post('components', data=kwargs)
+        return self._client._post(self.path, data=kwargs)
 
     @api_token_required
     def put(self, **kwargs):
         """
         https://docs.cachethq.io/docs/update-a-component
         """
-        required_args = ['id']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.put_required_args, kwargs)
 
-        return self._put('components/%s' % kwargs['id'], data=kwargs)
+        return self._client._put(self.item_path % kwargs['id'], data=kwargs)
 
 
 class Groups(Cachet):
     """
     /components/groups API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Groups, self).__init__(**kwargs)
+    path = 'components/groups'
+    item_path = 'components/groups/%s'
+    post_required_args = frozenset(['name'])
+    put_required_args = frozenset(['id'])
 
     @api_token_required
     def delete(self, id):
         """
         https://docs.cachethq.io/docs/delete-component-group
         """
-        return self._delete('components/groups/%s' % id)
+        return self._client._delete(self.item_path % id)
 
     def get(self, id=None, **kwargs):
         """
@@ -169,62 +205,74 @@ class Groups(Cachet):
         https://docs.cachethq.io/docs/get-a-component-group
         """
         if id is not None:
-            return self._get('components/groups/%s' % id, data=kwargs)
+            return self._client._get(self.item_path % id, data=kwargs)
         elif 'params' in kwargs:
             data = dict(kwargs)
             params = data.pop('params')
-            return self._get('components/groups', data=data, params=params)
+            return self._client._get(self.path, data=data, params=params)
         else:
-            return self._get('components/groups', data=kwargs)
+            return self._client._get(self.path, data=kwargs)
 
     @api_token_required
     def post(self, **kwargs):
         """
         https://docs.cachethq.io/docs/post-componentgroups
         """
-        required_args = ['name']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
 
-        return self._post('components/groups', data=kwargs)
+        return self._client._post(self.path, data=kwargs)
 
     @api_token_required
     def put(self, **kwargs):
         """
         https://docs.cachethq.io/docs/put-component-group
         """
-        required_args = ['id']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.put_required_args, kwargs)
 
-        return self._put('components/groups/%s' % kwargs['id'], data=kwargs)
+        return self._client._put(self.item_path % kwargs['id'], data=kwargs)
 
 
 class Incidents(Cachet):
     """
     /incidents API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Incidents, self).__init__(**kwargs)
+    path = 'incidents'
+    item_path = 'incidents/%s'
+    post_required_args = frozenset(['name', 'message', 'status', 'visible',
+                                    'notify'])
+    put_required_args = frozenset(['id'])
 
     @api_token_required
     def delete(self, id):
         """
         https://docs.cachethq.io/docs/delete-an-incident
         """
-        return self._delete('incidents/%s' % id)
+        return self._client._delete(self.item_path % id)
 
-    def get(self, id=None, **kwargs):
+    def get(self, id=None, stream=False, **kwargs):
         """
         https://docs.cachethq.io/docs/get-incidents
         https://docs.cachethq.io/docs/get-an-incident
+
+        Incidents can be filtered and paginated server-side through params,
+        for example: params={'name': name, 'status': status, 'per_page': 50,
+        'page': 1, 'sort': 'id', 'order': 'desc'}
+
+        With stream=True, the requests.Response is returned undecoded for the
+        caller to consume.
         """
+        # Only passed along when set, not every client supports streaming
+        options = {'stream': True} if stream else {}
         if id is not None:
-            return self._get('incidents/%s' % id, data=kwargs)
+            return self._client._get(self.item_path % id, data=kwargs,
+                                     **options)
         elif 'params' in kwargs:
             data = dict(kwargs)
             params = data.pop('params')
-            return self._get('incidents', data=data, params=params)
+            return self._client._get(self.path, data=data, params=params,
+                                     **options)
         else:
-            return self._get('incidents', data=kwargs)
+            return self._client._get(self.path, data=kwargs, **options)
 
     @api_token_required
     def post(self, **kwargs):
@@ -235,35 +283,35 @@ class Incidents(Cachet):
         kwargs.setdefault('visible', kwargs.get('visible', True))
         kwargs.setdefault('notify', kwargs.get('notify', False))
 
-        required_args = ['name', 'message', 'status', 'visible', 'notify']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
 
-        return self._post('incidents', data=kwargs)
+        return self._client._post(self.path, data=kwargs)
 
     @api_token_required
     def put(self, **kwargs):
         """
         https://docs.cachethq.io/docs/update-an-incident
         """
-        required_args = ['id']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.put_required_args, kwargs)
 
-        return self._put('incidents/%s' % kwargs['id'], data=kwargs)
+        return self._client._put(self.item_path % kwargs['id'], data=kwargs)
 
 
 class Metrics(Cachet):
     """
     /metrics API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Metrics, self).__init__(**kwargs)
+    path = 'metrics'
+    item_path = 'metrics/%s'
+    post_required_args = frozenset(['name', 'suffix', 'description',
+                                    'default_value'])
 
     @api_token_required
     def delete(self, id):
         """
         https://docs.cachethq.io/docs/delete-a-metric
         """
-        return self._delete('metrics/%s' % id)
+        return self._client._delete(self.item_path % id)
 
     def get(self, id=None, **kwargs):
         """
@@ -271,9 +319,9 @@ class Metrics(Cachet):
         https://docs.cachethq.io/docs/get-a-metric
         """
         if id is not None:
-            return self._get('metrics/%s' % id, data=kwargs)
+            return self._client._get(self.item_path % id, data=kwargs)
         else:
-            return self._get('metrics', data=kwargs)
+            return self._client._get(self.path, data=kwargs)
 
     @api_token_required
     def post(self, **kwargs):
@@ -283,25 +331,25 @@ class Metrics(Cachet):
         # default values
         kwargs.setdefault('default_value', kwargs.get('default_value', 0))
 
-        required_args = ['name', 'suffix', 'description', 'default_value']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
 
-        return self._post('metrics', data=kwargs)
+        return self._client._post(self.path, data=kwargs)
 
 
 class Points(Cachet):
     """
     /metrics/<metric>/points API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Points, self).__init__(**kwargs)
+    path = 'metrics/%s/points'
+    item_path = 'metrics/%s/points/%s'
+    post_required_args = frozenset(['id', 'value'])
 
     @api_token_required
     def delete(self, metric_id, point_id):
         """
         https://docs.cachethq.io/docs/delete-a-metric-point
         """
-        return self._delete('metrics/%s/points/%s' % (metric_id, point_id))
+        return self._client._delete(self.item_path % (metric_id, point_id))
 
     def get(self, metric_id=None, **kwargs):
         """
@@ -310,45 +358,70 @@ class Points(Cachet):
         if metric_id is None:
             raise AttributeError('metric_id is required to get metric points.')
 
-        return self._get('metrics/%s/points' % metric_id, data=kwargs)
+        return self._client._get(self.path % metric_id, data=kwargs)
 
     @api_token_required
     def post(self, **kwargs):
         """
         https://docs.cachethq.io/docs/post-metric-points
         """
-        required_args = ['id', 'value']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
+
+        return self._client._post(self.path % kwargs['id'], data=kwargs)
+
+    def _bulk_args(self, id, points):
+        """
+        Returns the post() arguments for each point, which is either a value
+        or a dict of arguments (i.e, value and timestamp).
+        Every point is checked so that nothing is sent if one is invalid.
+        """
+        bulk_args = []
+        for point in points:
+            if isinstance(point, dict):
+                args = dict(point)
+            else:
+                args = {'value': point}
+            args['id'] = id
+            check_required_args(self.post_required_args, args)
+            bulk_args.append(args)
+        return bulk_args
 
-        return self._post('metrics/%s/points' % kwargs['id'], data=kwargs)
+    @api_token_required
+    def post_bulk(self, id, points):
+        """
+        Posts several points to a metric.
+        The API has no bulk endpoint: the points are posted one after the
+        other over the same persistent connection.
+        """
+        return [self.post(**args) for args in self._bulk_args(id, points)]
 
 
 class Subscribers(Cachet):
     """
     /subscribers API endpoint
     """
-    def __init__(self, **kwargs):
-        super(Subscribers, self).__init__(**kwargs)
+    path = 'subscribers'
+    item_path = 'subscribers/%s'
+    post_required_args = frozenset(['email'])
 
     @api_token_required
     def delete(self, id):
         """
         https://docs.cachethq.io/docs/delete-subscriber
         """
-        return self._delete('subscribers/%s' % id)
+        return self._client._delete(self.item_path % id)
 
     def get(self, **kwargs):
         """
         https://docs.cachethq.io/docs/get-subscribers
         """
-        return self._get('subscribers', data=kwargs)
+        return self._client._get(self.path, data=kwargs)
 
     @api_token_required
     def post(self, **kwargs):
         """
         https://docs.cachethq.io/docs/subscribers
         """
-        required_args = ['email']
-        check_required_args(required_args, kwargs)
+        check_required_args(self.post_required_args, kwargs)
 
-        return self._post('subscribers', data=kwargs)
+        return self._client._post(self.path, data=kwargs)
@@ -13,53 +13,224 @@
 #   under the License.
 #
 
+import collections
+import copy
+import importlib
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Advertise the encodings urllib3 is able to decode. requests >= 2.26 works
+# it out already; older versions fall back on what urllib3 itself reports.
+try:
+    from requests.utils import DEFAULT_ACCEPT_ENCODING as ACCEPT_ENCODING
+except ImportError:
+    try:
+        from requests.packages.urllib3.util.request import ACCEPT_ENCODING
+    except ImportError:
+        # Older urllib3 only decodes these
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+# Methods that are safe to retry automatically: POST is left out on purpose,
+# retrying it could create duplicate incidents, components, etc.
+RETRY_METHODS = frozenset(['DELETE', 'GET', 'PUT'])
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_BACKOFF = 0.2
+
+# Maximum amount of responses kept by _get_cached
+CACHE_MAXSIZE = 256
+
+
+def _retry(total):
+    """
+    Builds the urllib3 retry policy used by the HTTP adapters.
+    Once retries are exhausted, the last response is returned so that
+    raise_for_status() raises the usual HTTPError.
+    """
+    try:
+        return Retry(total=total, backoff_factor=RETRY_BACKOFF,
+                     status_forcelist=RETRY_STATUSES,
+                     allowed_methods=RETRY_METHODS,
+                     raise_on_status=False)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(total=total, backoff_factor=RETRY_BACKOFF,
+                     status_forcelist=RETRY_STATUSES,
+                     method_whitelist=RETRY_METHODS,
+                     raise_on_status=False)
+
+
+def _loads(content):
+    """
+    Decodes JSON content, using orjson when it is available
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def pretty(obj):
+    """
+    Returns an indented JSON representation of an API response
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, indent=2)
+
+
+class _ResponseCache(object):
+    """
+    Responses memoized by path, used by the clients' _get_cached.
+    Entries expire after ttl seconds, if set, and the least recently used
+    entry is evicted once maxsize is reached. Copies are handed out so that
+    callers can't alter the cached responses.
+    """
+    def __init__(self, ttl=None, maxsize=CACHE_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+
+    def lookup(self, path, ttl=None):
+        """
+        Returns the cached response for path, raises KeyError if there is
+        none or if it has expired
+        """
+        if ttl is None:
+            ttl = self.ttl
+        timestamp, data = self._entries.pop(path)
+        if ttl is not None and time.time() - timestamp >= ttl:
+            raise KeyError(path)
+        # Re-inserted as the most recently used entry
+        self._entries[path] = (timestamp, data)
+        return copy.deepcopy(data)
+
+    def store(self, path, data):
+        self._entries.pop(path, None)
+        if len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+        self._entries[path] = (time.time(), data)
+        return copy.deepcopy(data)
+
+    def invalidate(self, path):
+        self._entries.pop(path, None)
+
+
+class _LazyEndpoint(object):
+    """
+    Instantiates an endpoint class bound to the client the first time it is
+    accessed and re-uses it afterwards.
+    """
+    def __init__(self, name, module='cachetclient.cachet'):
+        self.name = name
+        self.module = module
+
+    def __get__(self, client, owner=None):
+        if client is None:
+            return self
+        try:
+            return client._endpoints[self.name]
+        except KeyError:
+            # Imported lazily since the endpoint modules import this one
+            cls = getattr(importlib.import_module(self.module), self.name)
+            endpoint = client._endpoints[self.name] = cls(client)
+            return endpoint
 
 
 class CachetClient(object):
+    ping = _LazyEndpoint('Ping')
+    version = _LazyEndpoint('Version')
+    components = _LazyEndpoint('Components')
+    groups = _LazyEndpoint('Groups')
+    incidents = _LazyEndpoint('Incidents')
+    metrics = _LazyEndpoint('Metrics')
+    points = _LazyEndpoint('Points')
+    subscribers = _LazyEndpoint('Subscribers')
+
     def __init__(self, **kwargs):
         """
         Initialize the class, get the necessary parameters
         """
         try:
-            self.endpoint = kwargs['endpoint']
+            self.endpoint = kwargs['endpoint'].rstrip('/')
         except KeyError:
             raise KeyError('Cachet API endpoint is required')
+        self._url = self.endpoint + '/'
 
         self.user_agent = kwargs.get('user_agent', 'python-cachetclient')
-        self.api_token = kwargs.get('api_token', None)
         self.timeout = kwargs.get('timeout', None)
         self.verify = kwargs.get('verify', None)
         self.pagination = kwargs.get('pagination', False)
+        self.pool_connections = kwargs.get('pool_connections', 10)
+        self.pool_maxsize = kwargs.get('pool_maxsize', 50)
+        self.max_retries = kwargs.get('max_retries', 3)
+        self.cache_ttl = kwargs.get('cache_ttl', None)
+        self._cache = _ResponseCache(ttl=self.cache_ttl)
+        self._endpoints = {}
 
+        # Keep connections alive and re-use them across calls
         self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=_retry(self.max_retries))
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
 
-    def _request(self, url, method, **kwargs):
+        # Headers sent with every request
+        self.http.headers.update({
+            'User-Agent': self.user_agent,
+            'Accept': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Content-Type': 'application/json'
+        })
+        self.api_token = kwargs.get('api_token', None)
+
+    @property
+    def api_token(self):
+        return self._api_token
+
+    @api_token.setter
+    def api_token(self, api_token):
+        # Keep the session header in sync with the token
+        self._api_token = api_token
+        if api_token is None:
+            self.http.headers.pop('X-Cachet-Token', None)
+        else:
+            self.http.headers['X-Cachet-Token'] = api_token
+
+    def _request(self, url, method, parse_json=True, **kwargs):
         if self.timeout is not None:
             kwargs.setdefault('timeout', self.timeout)
 
         if self.verify is not None:
             kwargs.setdefault('verify', self.verify)
 
-        kwargs.setdefault('headers', kwargs.get('headers', {}))
-        kwargs['headers']['User-Agent'] = self.user_agent
-        kwargs['headers']['Accept'] = 'application/json'
-        kwargs['headers']['Content-Type'] = 'application/json'
-        if self.api_token is not None:
-            kwargs['headers']['X-Cachet-Token'] = self.api_token
-
-        # If we're sending data, make sure it's json encoded
-        if 'data' in kwargs:
-            kwargs['data'] = json.dumps(kwargs['data'])
+        # If we're sending data, make sure it's json encoded. kwargs is left
+        # untouched in case the request has to be sent again for pagination.
+        request_kwargs = dict(kwargs)
+        if 'data' in request_kwargs:
+            data = request_kwargs.pop('data')
+            if orjson is not None:
+                request_kwargs['data'] = orjson.dumps(data)
+            else:
+                request_kwargs['json'] = data
 
-        resp = self.http.request(method, url, **kwargs)
+        resp = self.http.request(method, url, **request_kwargs)
         if not resp.ok:
             resp.raise_for_status()
 
-        try:
-            body = resp.json()
-        except ValueError:
+        # Empty responses (i.e, from DELETE) don't need to be decoded and
+        # streamed responses are left for the caller to consume
+        if parse_json and not kwargs.get('stream') and resp.content:
+            body = _loads(resp.content)
+        else:
             body = None
 
         if not self.pagination:
@@ -74,21 +245,45 @@ class CachetClient(object):
         return resp, body
 
     def _delete(self, path, **kwargs):
-        url = "%s/%s" % (self.endpoint, path)
-        response, data = self._request(url, 'DELETE', **kwargs)
+        url = self._url + path
+        try:
+            response, data = self._request(url, 'DELETE', parse_json=False,
+                                           **kwargs)
+        finally:
+            self._cache.invalidate(path)
         return True
 
-    def _get(self, path, **kwargs):
-        url = "%s/%s" % (self.endpoint, path)
-        response, data = self._request(url, 'GET', **kwargs)
-        return json.dumps(data, indent=2)
+    def _get(self, path, stream=False, **kwargs):
+        """
+        Returns the decoded response or, when stream is True, the
+        requests.Response for the caller to consume
+        """
+        url = self._url + path
+        response, data = self._request(url, 'GET', stream=stream, **kwargs)
+        if stream:
+            return response
+        return data
+
+    def _get_cached(self, path, ttl=None):
+        """
+        Same as _get but memoizes the response for a given path.
+        Cached responses expire after ttl (or cache_ttl) seconds, if set, and
+        are dropped when the same path is updated or deleted.
+        """
+        try:
+            return self._cache.lookup(path, ttl)
+        except KeyError:
+            return self._cache.store(path, self._get(path))
 
     def _post(self, path, **kwargs):
-        url = "%s/%s" % (self.endpoint, path)
+        url = self._url + path
         response, data = self._request(url, 'POST', **kwargs)
-        return json.dumps(data, indent=2)
+        return data
 
     def _put(self, path, **kwargs):
-        url = "%s/%s" % (self.endpoint, path)
-        response, data = self._request(url, 'PUT', **kwargs)
-        return json.dumps(data, indent=2)
+        url = self._url + path
+        try:
+            response, data = self._request(url, 'PUT', **kwargs)
+        finally:
+            self._cache.invalidate(path)
+        return data
@@ -0,0 +1,176 @@
+#   Copyright Red Hat, Inc. All Rights Reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+# Configuration, statuses and templates shared by the Sensu handlers in
+# contrib/ (sensu-cachet.py and sensu-cachet-async.py).
+# The helpers loading the configuration and the event print the error and
+# exit like the handlers are expected to.
+
+import os
+import sys
+import json
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+CONFIG_FILE = '/etc/sensu/conf.d/cachet.json'
+CONFIG_KEYS = ('endpoint', 'api_token', 'uchiwa')
+
+# Map of "nagios-like"/Sensu event statuses to Cachet statuses and incident
+# names:
+#   - https://docs.cachethq.io/docs/incident-statuses
+#   - https://docs.cachethq.io/docs/component-statuses
+STATUS = {
+    'incident': {
+        'create': 2,  # Identified
+        'resolve': 4,  # Fixed
+        'flapping': 1,  # Investigating
+        'unknown': 1  # Investigating
+    },
+    'component': {
+        'create': 3,  # Partial outage
+        'resolve': 1,  # Operational
+        'flapping': 3,  # Partial outage
+        'unknown': 3  # Partial outage
+    },
+    'action': {
+        'create': "Incident: {0}",
+        'resolve': "Resolved incident: {0}",
+        'flapping': "Incident: {0}",
+        'unknown': "Incident: {0}"
+    }
+}
+
+# Incident templates
+NEW_INCIDENT = """
+### {component}
+Our monitoring infrastructure detected an issue for this service.
+
+The details of the problem are as follows:
+```
+# Host: {host}
+# Check: {check}
+{output}
+```
+
+More details are available on the [monitoring dashboard]({check_url}).
+"""
+
+RESOLVED_INCIDENT = """
+### {component}
+Our monitoring infrastructure considers an issue resolved for this service.
+
+The details of the resolution are as follows:
+```
+# Host: {host}
+# Check: {check}
+{output}
+```
+
+More details are available on the [monitoring dashboard]({check_url}).
+"""
+
+# Bound once rather than looked up for every message
+render_new_incident = NEW_INCIDENT.format
+render_resolved_incident = RESOLVED_INCIDENT.format
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Loads the handler configuration, a JSON file with the Cachet endpoint and
+    API token and the Uchiwa URL
+    """
+    if not os.path.isfile(path):
+        print('Unable to find configuration file: %s' % path)
+        sys.exit(1)
+    with open(path, 'rb') as f:
+        config = loads(f.read())
+
+    for key in CONFIG_KEYS:
+        if key not in config:
+            print("Unable to find required configuration key: '%s'" % key)
+            sys.exit(1)
+    return config
+
+
+def read_event():
+    """
+    Loads the Sensu event from STDIN and maps the data we're interested in
+    """
+    try:
+        data = json.load(sys.stdin)
+    except Exception as e:
+        print("Unable to parse JSON: {0}".format(str(e)))
+        sys.exit(1)
+
+    host_params = ['action', 'client', 'check']
+    return {
+        param: data.get(param, None)
+        for param in host_params
+    }
+
+
+def describe_event(params, uchiwa):
+    """
+    Gathers the details of the incident a Sensu event maps to
+    """
+    # Sensu client event data
+    host = params['client']['name']
+    # datacenter is a custom client attribute in order to be able to generate
+    # Uchiwa links properly
+    datacenter = params['client']['datacenter']
+
+    # Sensu check event data
+    check = params['check']['name']
+
+    check_url = "{0}/#/client/{1}/{2}?check={3}".format(uchiwa,
+                                                        datacenter,
+                                                        host,
+                                                        check)
+
+    action = params['action']
+    if action not in STATUS['action']:
+        action = 'unknown'
+
+    return {
+        'action': params['action'],
+        'host': host,
+        'check': check,
+        'output': params['check']['output'],
+        'check_url': check_url,
+        # component_id is a custom check attribute to maps to a Cachet
+        # component
+        'component_id': params['check']['component_id'],
+        'incident_name': STATUS['action'][action].format(check),
+        'incident_status': STATUS['incident'][action],
+        'component_status': STATUS['component'][action]
+    }
+
+
+def incident_message(event, component):
+    """
+    Renders the incident message for an event and its Cachet component
+    """
+    if event['action'] == 'resolve':
+        render = render_resolved_incident
+    else:
+        render = render_new_incident
+    return render(host=event['host'],
+                  check=event['check'],
+                  component=component['name'],
+                  output=event['output'],
+                  check_url=event['check_url'])
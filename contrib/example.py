@@ -13,68 +13,70 @@
 #   under the License.
 #
 
-import cachetclient.cachet as cachet
-import json
+from cachetclient.client import CachetClient, pretty
 
 ENDPOINT = 'http://status.domain.tld/api/v1'
 API_TOKEN = 'token'
 
+# Every endpoint shares the client's HTTP session
+client = CachetClient(endpoint=ENDPOINT, api_token=API_TOKEN)
+
 # /ping
-ping = cachet.Ping(endpoint=ENDPOINT)
-print(ping.get())
+ping = client.ping
+print(pretty(ping.get()))
 
 # /version
-version = cachet.Version(endpoint=ENDPOINT)
-print(version.get())
+version = client.version
+print(pretty(version.get()))
 
 # /components
-components = cachet.Components(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_component = json.loads(components.post(name='Test component',
-                                           status=1,
-                                           description='Test component'))
-print(components.get())
+components = client.components
+new_component = components.post(name='Test component',
+                                status=1,
+                                description='Test component')
+print(pretty(components.get()))
 components.put(id=new_component['data']['id'], description='Updated component')
-print(components.get(id=new_component['data']['id']))
+print(pretty(components.get(id=new_component['data']['id'])))
 components.delete(id=new_component['data']['id'])
 
 # /components/groups
-groups = cachet.Groups(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_group = json.loads(groups.post(name='Test group'))
-print(groups.get())
+groups = client.groups
+new_group = groups.post(name='Test group')
+print(pretty(groups.get()))
 groups.put(id=new_group['data']['id'], name='Updated group')
-print(groups.get(id=new_group['data']['id']))
+print(pretty(groups.get(id=new_group['data']['id'])))
 groups.delete(new_group['data']['id'])
 
 # /incidents
-incidents = cachet.Incidents(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_incident = json.loads(incidents.post(name='Test incident',
-                                         message='Houston, we have a problem.',
-                                         status=1))
-print(incidents.get())
+incidents = client.incidents
+new_incident = incidents.post(name='Test incident',
+                              message='Houston, we have a problem.',
+                              status=1)
+print(pretty(incidents.get()))
 incidents.put(id=new_incident['data']['id'],
               message="There's another problem, Houston.")
-print(incidents.get(id=new_incident['data']['id']))
+print(pretty(incidents.get(id=new_incident['data']['id'])))
 incidents.delete(id=new_incident['data']['id'])
 
 # /metrics
 # /metrics/points
-metrics = cachet.Metrics(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_metric = json.loads(metrics.post(name='Test metric',
-                                     suffix='Numbers per hour',
-                                     description='How many numbers per hour',
-                                     default_value=0))
-print(metrics.get())
-print(metrics.get(id=new_metric['data']['id']))
+metrics = client.metrics
+new_metric = metrics.post(name='Test metric',
+                          suffix='Numbers per hour',
+                          description='How many numbers per hour',
+                          default_value=0)
+print(pretty(metrics.get()))
+print(pretty(metrics.get(id=new_metric['data']['id'])))
 
-points = cachet.Points(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_point = json.loads(points.post(id=new_metric['data']['id'], value=5))
-print(points.get(metric_id=new_metric['data']['id']))
+points = client.points
+new_point = points.post(id=new_metric['data']['id'], value=5)
+print(pretty(points.get(metric_id=new_metric['data']['id'])))
 
 points.delete(metric_id=new_metric['data']['id'],
               point_id=new_point['data']['id'])
 metrics.delete(id=new_metric['data']['id'])
 
 # /subscribers
-subscribers = cachet.Subscribers(endpoint=ENDPOINT, api_token=API_TOKEN)
-new_subscriber = json.loads(subscribers.post(email='test@test.org'))
+subscribers = client.subscribers
+new_subscriber = subscribers.post(email='test@test.org')
 subscribers.delete(id=new_subscriber['data']['id'])
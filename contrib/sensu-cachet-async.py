@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#   Copyright Red Hat, Inc. All Rights Reserved.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+# This script is a Sensu handler meant to accept data from Sensu as stdin in
+# order to post events to a Cachet instance.
+# It is the asyncio flavor of sensu-cachet.py: the component and the existing
+# incidents are retrieved concurrently.
+
+# Requirements:
+# - Python 3
+# - pip install python-cachetclient[aiohttp]
+# - A cachet.json configuration file in /etc/sensu/conf.d/cachet.json:
+#   {
+#     "endpoint": "http://status.domain.tld/api/v1",
+#     "api_token": "token",
+#     "uchiwa": "http://uchiwa.tld/"
+#   }
+# - A 'datacenter' parameter in Sensu clients (to be able to craft Uchiwa links
+#   properly). TODO: Make this optional somehow
+#
+
+import asyncio
+
+import cachetclient.aclient as aclient
+import cachetclient.sensu as sensu
+
+CONFIG = sensu.load_config()
+
+# A single client (and HTTP session) is shared by every call in this handler
+CLIENT = aclient.AsyncCachetClient(endpoint=CONFIG['endpoint'],
+                                   api_token=CONFIG['api_token'])
+
+
+async def create_incident(**kwargs):
+    """
+    Creates an incident
+    """
+    incidents = CLIENT.incidents
+    if 'component_id' in kwargs:
+        return await incidents.post(
+            name=kwargs['name'],
+            message=kwargs['message'],
+            status=kwargs['status'],
+            component_id=kwargs['component_id'],
+            component_status=kwargs['component_status']
+        )
+    else:
+        return await incidents.post(name=kwargs['name'],
+                                    message=kwargs['message'],
+                                    status=kwargs['status'])
+
+
+async def get_incidents(name, status):
+    """
+    Gets the set of (name, status, message) of incidents matching name and
+    status
+    """
+    incidents = CLIENT.incidents
+    # Let Cachet filter on name and status before sending the incidents back
+    all_incidents = await incidents.get(params={'name': name,
+                                                'status': status})
+    return set(
+        (incident['name'], incident['status'], incident['message'].strip())
+        for incident in all_incidents['data']
+    )
+
+
+async def get_component(id):
+    """
+    Gets a Cachet component by id
+    """
+    components = CLIENT.components
+    component = await components.get_cached(id)
+    return component['data']
+
+
+async def handle(event):
+    """
+    Handles a Sensu event
+    """
+    # Retrieve the real component from Cachet based on its ID while the
+    # existing incidents are being retrieved.
+    component, existing = await asyncio.gather(
+        get_component(event['component_id']),
+        get_incidents(event['incident_name'], event['incident_status'])
+    )
+    message = sensu.incident_message(event, component)
+
+    # If an incident with the same properties already exist, we can stop here
+    # This probably means an ongoing issue, Sensu will send 'create' events
+    # every time.
+    if (event['incident_name'], event['incident_status'],
+            message.strip()) in existing:
+        return
+
+    # Otherwise, create an incident and update the component if is it known.
+    if component is not None:
+        await create_incident(name=event['incident_name'],
+                              message=message,
+                              status=event['incident_status'],
+                              component_id=component['id'],
+                              component_status=event['component_status'])
+
+
+async def main(event):
+    async with CLIENT:
+        await handle(event)
+
+
+if __name__ == '__main__':
+    event = sensu.describe_event(sensu.read_event(), CONFIG['uchiwa'])
+    asyncio.run(main(event))
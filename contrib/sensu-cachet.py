@@ -19,6 +19,8 @@
 
 # Requirements:
 # - pip install python-cachetclient
+# - Optionally, pip install ijson to stream the incidents instead of loading
+#   each page in memory
 # - A cachet.json configuration file in /etc/sensu/conf.d/cachet.json:
 #   {
 #     "endpoint": "http://status.domain.tld/api/v1",
@@ -29,89 +31,32 @@
 #   properly). TODO: Make this optional somehow
 #
 
-import os
 import sys
-import json
+from contextlib import closing
 
-import cachetclient.cachet as cachet
-
-# Load configuration
-CONFIG_FILE = '/etc/sensu/conf.d/cachet.json'
-if os.path.isfile(CONFIG_FILE):
-    with open(CONFIG_FILE) as f:
-        CONFIG = json.loads(f.read())
-else:
-    print('Unable to find configuration file: %s' % CONFIG_FILE)
-    sys.exit(1)
+import cachetclient.client as client
+import cachetclient.sensu as sensu
 
 try:
-    ENDPOINT = CONFIG['endpoint']
-    API_TOKEN = CONFIG['api_token']
-    UCHIWA = CONFIG['uchiwa']
-except KeyError as e:
-    print("Unable to find required configuration key: %s" % str(e))
-    sys.exit(1)
-
-# Map of "nagios-like"/Sensu event statuses to Cachet statuses and incident
-# names:
-#   - https://docs.cachethq.io/docs/incident-statuses
-#   - https://docs.cachethq.io/docs/component-statuses
-STATUS = {
-    'incident': {
-        'create': 2, # Identified
-        'resolve': 4, # Fixed
-        'flapping': 1, # Investigating
-        'unknown': 1 # Investigating
-    },
-    'component': {
-        'create': 3,  # Partial outage
-        'resolve': 1,  # Operational
-        'flapping': 3,  # Partial outage
-        'unknown': 3  # Partial outage
-    },
-    'action': {
-        'create': "Incident: {0}",
-        'resolve': "Resolved incident: {0}",
-        'flapping': "Incident: {0}",
-        'unknown': "Incident: {0}"
-    }
-}
-
-# Incident templates
-NEW_INCIDENT = """
-### {component}
-Our monitoring infrastructure detected an issue for this service.
-
-The details of the problem are as follows:
-```
-# Host: {host}
-# Check: {check}
-{output}
-```
-
-More details are available on the [monitoring dashboard]({check_url}).
-"""
-
-RESOLVED_INCIDENT = """
-### {component}
-Our monitoring infrastructure considers an issue resolved for this service.
+    import ijson
+except ImportError:
+    ijson = None
 
-The details of the resolution are as follows:
-```
-# Host: {host}
-# Check: {check}
-{output}
-```
+CONFIG = sensu.load_config()
 
-More details are available on the [monitoring dashboard]({check_url}).
-"""
+# A single client (and HTTP session) is shared by every call in this handler.
+# Pagination is handled by the handler so that pages are only retrieved when
+# needed.
+CLIENT = client.CachetClient(endpoint=CONFIG['endpoint'],
+                             api_token=CONFIG['api_token'],
+                             pagination=True)
 
 
 def create_incident(**kwargs):
     """
     Creates an incident
     """
-    incidents = cachet.Incidents(endpoint=ENDPOINT, api_token=API_TOKEN)
+    incidents = CLIENT.incidents
     if 'component_id' in kwargs:
         return incidents.post(name=kwargs['name'],
                               message=kwargs['message'],
@@ -124,16 +69,65 @@ def create_incident(**kwargs):
                               status=kwargs['status'])
 
 
+def stream_incidents(params, page_info):
+    """
+    Yields the incidents of a single page as they are decoded from the
+    response, page_info is filled with the page's meta.pagination
+    """
+    resp = CLIENT.incidents.get(params=params, stream=True)
+    with closing(resp):
+        # Let urllib3 decompress the response if needed
+        resp.raw.decode_content = True
+
+        def events():
+            for prefix, event, value in ijson.parse(resp.raw):
+                if prefix.startswith('meta.pagination.'):
+                    page_info[prefix.rsplit('.', 1)[1]] = value
+                yield prefix, event, value
+
+        for incident in ijson.items(events(), 'data.item'):
+            yield incident
+
+
+def iter_incidents(name, status, per_page=50):
+    """
+    Yields incidents with this name and status, most recent first, one page
+    at a time
+    """
+    incidents = CLIENT.incidents
+    # Let Cachet filter on name and status before sending the incidents back
+    params = {
+        'name': name,
+        'status': status,
+        'per_page': per_page,
+        'sort': 'id',
+        'order': 'desc',
+        'page': 1
+    }
+    while True:
+        if ijson is not None:
+            page_info = {}
+            for incident in stream_incidents(dict(params), page_info):
+                yield incident
+        else:
+            page = incidents.get(params=dict(params))
+            for incident in page['data']:
+                yield incident
+            page_info = page['meta']['pagination']
+
+        if page_info['current_page'] >= page_info['total_pages']:
+            return
+        params['page'] += 1
+
+
 def incident_exists(name, message, status):
     """
     Check if an incident with these attributes already exists
     """
-    incidents = cachet.Incidents(endpoint=ENDPOINT)
-    all_incidents = json.loads(incidents.get())
-    for incident in all_incidents['data']:
-        if name == incident['name'] and \
-           status == incident['status'] and \
-           message.strip() == incident['message'].strip():
+    wanted = (name, status, message.strip())
+    for incident in iter_incidents(name, status):
+        if (incident['name'], incident['status'],
+                incident['message'].strip()) == wanted:
             return True
     return False
 
@@ -142,77 +136,29 @@ def get_component(id):
     """
     Gets a Cachet component by id
     """
-    components = cachet.Components(endpoint=ENDPOINT)
-    component = json.loads(components.get(id=id))
+    components = CLIENT.components
+    component = components.get_cached(id)
     return component['data']
 
 
 if __name__ == '__main__':
-    # Load Sensu event from STDIN
-    try:
-        data = json.load(sys.stdin)
-    except Exception as e:
-        print("Unable to parse JSON: {0}".format(str(e)))
-        sys.exit(1)
-
-    # Map the data we're interested in
-    host_params = ['action', 'client', 'check']
-    params = {
-        param: data.get(param, None)
-        for param in host_params
-    }
+    event = sensu.describe_event(sensu.read_event(), CONFIG['uchiwa'])
 
-    # Sensu client event data
-    host = params['client']['name']
-    # datacenter is a custom client attribute in order to be able to generate
-    # Uchiwa links properly
-    datacenter = params['client']['datacenter']
-
-    # Sensu check event data
-    check = params['check']['name']
-    output = params['check']['output']
-    # component_id is a custom check attribute to maps to a Cachet component
-    # Retrieve the real component from Cachet based on that ID
-    component = params['check']['component_id']
-    component = get_component(component)
-
-    check_url = "{0}/#/client/{1}/{2}?check={3}".format(UCHIWA,
-                                                        datacenter,
-                                                        host,
-                                                        check)
-
-    if params['action'] in STATUS['action']:
-        incident_name = STATUS['action'][params['action']].format(check)
-        incident_status = STATUS['incident'][params['action']]
-        component_status = STATUS['component'][params['action']]
-    else:
-        incident_name = STATUS['action']['unknown'].format(check)
-        incident_status = STATUS['incident']['unknown']
-        component_status = STATUS['component']['unknown']
-
-    if params['action'] == 'resolve':
-        message = RESOLVED_INCIDENT.format(host=host,
-                                           check=check,
-                                           component=component['name'],
-                                           output=output,
-                                           check_url=check_url)
-    else:
-        message = NEW_INCIDENT.format(host=host,
-                                      check=check,
-                                      component=component['name'],
-                                      output=output,
-                                      check_url=check_url)
+    # Retrieve the real component from Cachet based on its ID
+    component = get_component(event['component_id'])
+    message = sensu.incident_message(event, component)
 
     # If an incident with the same properties already exist, we can stop here
     # This probably means an ongoing issue, Sensu will send 'create' events
     # every time.
-    if incident_exists(incident_name, message, incident_status):
+    if incident_exists(event['incident_name'], message,
+                       event['incident_status']):
         sys.exit(0)
 
     # Otherwise, create an incident and update the component if is it known.
     if component is not None:
-        create_incident(name=incident_name,
+        create_incident(name=event['incident_name'],
                         message=message,
-                        status=incident_status,
+                        status=event['incident_status'],
                         component_id=component['id'],
-                        component_status=component_status)
+                        component_status=event['component_status'])